@@ -1,4 +1,6 @@
 import os.path
+from typing import List
+from urllib.parse import quote
 
 from aws_cdk import (
     aws_ec2 as ec2,
@@ -9,14 +11,23 @@ from aws_cdk import (
     aws_certificatemanager as acm,
     aws_route53 as route53,
     aws_route53_targets as targets,
+    aws_s3_assets as assets,
     aws_secretsmanager as secretsmanager,
+    CfnOutput,
     Stack,
 )
 from constructs import Construct
 
 EC2_ITYPE: str = "t2.medium"
+EC2_AMI_PARAM: str = (
+    "/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-x86_64"
+)
 EBS_GB: int = 100
 REMS_LISTEN: int = 3000
+REMS_LISTEN_STR: str = str(REMS_LISTEN)
+EC2_SG_DESC: str = f"Allow traffic from ALB on port {REMS_LISTEN}"
+EC2_SG_INGRESS_DESC: str = f"Allow ALB to access EC2 on port {REMS_LISTEN}"
+REMS_BOOTSTRAP_PATH: str = os.path.join(os.path.dirname(__file__), "rems_bootstrap.sh")
 
 
 class GdiStarterKitStack(Stack):
@@ -39,6 +50,12 @@ class GdiStarterKitStack(Stack):
         rems_domain_prefix = self.node.try_get_context("rems_domain_prefix") or "rems"
         rems_domain = f"{rems_domain_prefix}.{hz_domain}"
         rems_url = f"https://{rems_domain}/"  # <- requires trailing slash
+        # (optional) ID of the hosted zone; skips the synth-time Route 53 lookup
+        hz_id = self.node.try_get_context("hz_id")
+        # (optional) AZs to deploy the VPC across; skips the synth-time AZ lookup
+        azs = self._context_azs()
+        # (optional) name pattern of a pre-built AMI owned by this account
+        rems_ami_name = self.node.try_get_context("rems_ami_name")
 
         # SSM Parameters
         param_rems_oidc_sec_name = ssm.StringParameter(
@@ -49,12 +66,22 @@ class GdiStarterKitStack(Stack):
         )
 
         # AWS Secrets Manager Secrets
-        oidc_sec = secretsmanager.Secret.from_secret_name_v2(
-            self, "oidc_sec", rems_oidc_sec_name
-        )
+        oidc_sec = imported_secret(self, rems_oidc_sec_name)
 
-        # VPC
-        vpc = ec2.Vpc(self, "VPC", max_azs=2, nat_gateways=1)
+        # VPC - public subnets only. The instance reaches the internet directly
+        # (no NAT gateway) and only accepts inbound traffic from the ALB.
+        vpc = ec2.Vpc(
+            self,
+            "VPC",
+            availability_zones=azs or None,
+            max_azs=None if azs else 2,
+            nat_gateways=0,
+            subnet_configuration=[
+                ec2.SubnetConfiguration(
+                    name="Public", subnet_type=ec2.SubnetType.PUBLIC
+                )
+            ],
+        )
 
         # Security group for ALB
         alb_sg = ec2.SecurityGroup(
@@ -71,13 +98,13 @@ class GdiStarterKitStack(Stack):
             self,
             "Ec2SecurityGroup",
             vpc=vpc,
-            description=f"Allow traffic from ALB on port {REMS_LISTEN}",
+            description=EC2_SG_DESC,
             allow_all_outbound=True,
         )
         ec2_sg.add_ingress_rule(
             alb_sg,
             ec2.Port.tcp(REMS_LISTEN),
-            f"Allow ALB to access EC2 on port {REMS_LISTEN}",
+            EC2_SG_INGRESS_DESC,
         )
 
         # IAM Role with Systems Manager policy
@@ -93,16 +120,26 @@ class GdiStarterKitStack(Stack):
         )
         oidc_sec.grant_read(role)
 
+        # Machine image: a pre-built AMI (looked up once, then cached in
+        # cdk.context.json) or stock AL2023, resolved by EC2 at launch so synth
+        # makes no SSM lookup and the template does not change (replacing the
+        # instance) on new AMIs
+        if rems_ami_name:
+            machine_image = ec2.MachineImage.lookup(name=rems_ami_name, owners=["self"])
+        else:
+            machine_image = ec2.MachineImage.resolve_ssm_parameter_at_launch(
+                EC2_AMI_PARAM
+            )
+
         # EC2 Instance
         instance = ec2.Instance(
             self,
             "RemsInstance",
             instance_type=ec2.InstanceType(EC2_ITYPE),
-            machine_image=ec2.MachineImage.latest_amazon_linux2023(),
+            machine_image=machine_image,
             vpc=vpc,
-            vpc_subnets=ec2.SubnetSelection(
-                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
-            ),
+            vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PUBLIC),
+            associate_public_ip_address=True,
             security_group=ec2_sg,
             role=role,
             block_devices=[
@@ -111,18 +148,26 @@ class GdiStarterKitStack(Stack):
                 )
             ],
             user_data=config_rems_host(
-                param_rems_oidc_sec_name.parameter_name, rems_url
+                self, role, param_rems_oidc_sec_name.parameter_name, rems_url
             ),
         )
 
         # To request a certificate that gets automatically approved based on DNS
-        # (i.e. proof that we own the domain), look up the current HostedZone and
-        # reference it in the from_dns() validation call when creating the cert:
+        # (i.e. proof that we own the domain), reference the current HostedZone
+        # in the from_dns() validation call when creating the cert. If the zone
+        # ID is known, import it directly rather than looking it up at synth
+        # time (which needs credentials and a Route 53 API call whenever
+        # cdk.context.json is not populated):
 
         # Route 53 Hosted Zone
-        hosted_zone = route53.HostedZone.from_lookup(
-            self, "HostedZone", domain_name=hz_domain
-        )
+        if hz_id:
+            hosted_zone = route53.HostedZone.from_hosted_zone_attributes(
+                self, "HostedZone", hosted_zone_id=hz_id, zone_name=hz_domain
+            )
+        else:
+            hosted_zone = route53.HostedZone.from_lookup(
+                self, "HostedZone", domain_name=hz_domain
+            )
 
         # TLS certificate for the subdomain
         rems_cert = acm.Certificate(
@@ -137,11 +182,6 @@ class GdiStarterKitStack(Stack):
             self, "GDI-ALB", vpc=vpc, internet_facing=True, security_group=alb_sg
         )
 
-        # Add an HTTPS listener for TLS traffic
-        listener = alb.add_listener(
-            "HttpsListener", port=443, certificates=[rems_cert], open=True
-        )
-
         # Create a target group for REMS
         atg_rems = elbv2.ApplicationTargetGroup(
             self,
@@ -149,21 +189,17 @@ class GdiStarterKitStack(Stack):
             vpc=vpc,
             port=REMS_LISTEN,
             protocol=elbv2.ApplicationProtocol.HTTP,
-            targets=[
-                elbv2_targets.InstanceIdTarget(instance.instance_id, port=REMS_LISTEN)
-            ],
-            health_check=elbv2.HealthCheck(port=f"{REMS_LISTEN}"),
+            targets=[elbv2_targets.InstanceTarget(instance, port=REMS_LISTEN)],
+            health_check=elbv2.HealthCheck(port=REMS_LISTEN_STR),
         )
 
-        # Add a default action (target group) to the listener
-        listener.add_target_groups("DefaultTargetGroup", target_groups=[atg_rems])
-
-        # Add a routing rule for the domain
-        listener.add_target_groups(
-            "RemsDomainRule",
-            priority=1,
-            conditions=[elbv2.ListenerCondition.host_headers([rems_domain])],
-            target_groups=[atg_rems],
+        # Add an HTTPS listener for TLS traffic, forwarding to REMS by default
+        alb.add_listener(
+            "HttpsListener",
+            port=443,
+            certificates=[rems_cert],
+            open=True,
+            default_target_groups=[atg_rems],
         )
 
         # Route 53 A Record for the Load Balancer
@@ -175,8 +211,47 @@ class GdiStarterKitStack(Stack):
             target=route53.RecordTarget.from_alias(targets.LoadBalancerTarget(alb)),
         )
 
+        # Stack outputs for operators. These are template-only, unlike SSM
+        # parameters which are separate resources; only values the instance
+        # itself reads at boot (e.g. /Rems/OidcSecName) belong in SSM.
+        CfnOutput(self, "RemsInstanceId", value=instance.instance_id)
+        CfnOutput(self, "RemsPublicURL", value=rems_url)
+
+    @property
+    def availability_zones(self) -> List[str]:
+        # Vpc validates the AZs it is given against this property, which for an
+        # environment-specific stack otherwise queries the availability-zones
+        # context provider (a DescribeAvailabilityZones call at synth).
+        return self._context_azs() or super().availability_zones
+
+    def _context_azs(self) -> List[str]:
+        azs = self.node.try_get_context("azs") or []
+        if isinstance(azs, str):  # e.g. cdk deploy --context azs=a,b
+            azs = azs.split(",")
+        return [az.strip() for az in azs if az.strip()]
 
-def config_rems_host(param_rems_oidc_sec_name: str, rems_url: str) -> ec2.UserData:
+
+def imported_secret(scope: Construct, name: str) -> secretsmanager.ISecret:
+    """
+    Import the named AWS Secrets Manager secret into `scope`, reusing the
+    construct if that secret has already been imported there.
+    """
+    # construct ids may not contain "/"; percent-encoding keeps distinct names
+    # (e.g. "a/b" and "a-b") on distinct ids
+    construct_id = f"Secret-{quote(name, safe='')}"
+    existing = scope.node.try_find_child(construct_id)
+    if existing is not None:
+        if getattr(existing, "secret_name", None) != name:
+            raise ValueError(
+                f"{existing.node.path} exists but is not the imported secret {name!r}"
+            )
+        return existing
+    return secretsmanager.Secret.from_secret_name_v2(scope, construct_id, name)
+
+
+def config_rems_host(
+    scope: Construct, role: iam.IRole, param_rems_oidc_sec_name: str, rems_url: str
+) -> ec2.UserData:
     """
     As a prerequisite, the named AWS Secrets Manager entry (type: other) must
     exist and be configured with 3 key-value pairs:
@@ -185,46 +260,21 @@ def config_rems_host(param_rems_oidc_sec_name: str, rems_url: str) -> ec2.UserDa
         - 'oidc-client-secret'
     Passing only the secret name to the instance via SSM is for security.
     This is a bit clunky but avoids unwrapping secrets at CDK synthesis time.
+
+    The bootstrap script itself is shipped as an S3 asset (readable by `role`)
+    so that only the two deployment-specific values are rendered into the
+    user data.
     """
+    bootstrap = assets.Asset(scope, "rems_bootstrap.sh", path=REMS_BOOTSTRAP_PATH)
+    bootstrap.grant_read(role)
+
     user_data = ec2.UserData.for_linux()
     user_data.add_commands(
-        # install necessaries
-        r"""dnf update -y""",
-        r"""dnf install -y git docker pwgen""",
-        r"""systemctl enable docker""",
-        r"""systemctl start docker""",
-        r"""curl -L https://github.com/docker/compose/releases/latest/download/docker-compose-$(uname -s)-$(uname -m) -o /usr/local/bin/docker-compose""",
-        r"""chmod +x /usr/local/bin/docker-compose""",
-        # install authlib for generate_jwks.py
-        r"""curl -O https://bootstrap.pypa.io/get-pip.py""",
-        r"""python3 get-pip.py""",
-        r"""pip install authlib""",
-        # clone the REMS repo
-        r"""cd /opt""",
-        r"""git clone https://github.com/GUARDIANS-infrastructure/starter-kit-rems""",
-        r"""cd starter-kit-rems/""",
-        # generate keys
-        r"""python3 generate_jwks.py""",
-        # fetch secrets and other deployment config; set as env vars.
-        rf"""oidc_sec_name=$(aws ssm get-parameter --name "{param_rems_oidc_sec_name}" --query Parameter.Value --output text)""",
-        r"oidc_config=$(aws secretsmanager get-secret-value --secret-id $oidc_sec_name --query SecretString --output text | jq .)",
-        r"""export OIDC_METADATA_URL=$(jq -r '."oidc-metadata-url"' <<< $oidc_config)""",
-        r"""export OIDC_CLIENT_ID=$(jq -r '."oidc-client-id"' <<< $oidc_config)""",
-        r"""export OIDC_CLIENT_SECRET=$(jq -r '."oidc-client-secret"' <<< $oidc_config)""",
-        r"""export DB_NAME=remsdb""",
-        r"""export DB_USER=rems""",
-        r"""export DB_PASSWORD=$(pwgen)""",
-        rf"""export PUBLIC_URL={rems_url}""",
-        # configure the application
-        r"""for cfgfile in config.edn docker-compose.yml; do""",
-        r"""	tmpfile=$(mktemp)""",
-        r"""	\cp -f --preserve=all --attributes-only $cfgfile $tmpfile""",
-        r"""	envsubst < $cfgfile > $tmpfile""",
-        r"""	\mv -f $tmpfile $cfgfile""",
-        r"""done""",
-        # start the first time
-        r"""docker-compose up -d db""",
-        r"""docker-compose run --rm -e CMD="migrate" app""",
-        r"""docker-compose up -d app""",
+        rf"""export PARAM_OIDC_SEC_NAME={param_rems_oidc_sec_name}""",
+        rf"""export REMS_URL={rems_url}""",
+    )
+    local_path = user_data.add_s3_download_command(
+        bucket=bootstrap.bucket, bucket_key=bootstrap.s3_object_key
     )
+    user_data.add_execute_file_command(file_path=local_path)
     return user_data
@@ -0,0 +1,49 @@
+#!/bin/bash
+# First-boot configuration of the REMS host.
+# Expects the following to be exported by the instance user data:
+#   PARAM_OIDC_SEC_NAME - SSM parameter holding the OIDC RP secret name
+#   REMS_URL            - public URL of the service (with trailing slash)
+
+# install necessaries (anything already baked into the AMI is skipped)
+dnf update -y
+dnf install -y git docker pwgen python3-pip
+systemctl enable docker
+systemctl start docker
+if [ ! -x /usr/local/bin/docker-compose ]; then
+	curl -L https://github.com/docker/compose/releases/latest/download/docker-compose-$(uname -s)-$(uname -m) -o /usr/local/bin/docker-compose
+	chmod +x /usr/local/bin/docker-compose
+fi
+# install authlib for generate_jwks.py
+python3 -c "import authlib" 2>/dev/null || pip3 install authlib
+# clone the REMS repo
+cd /opt
+git clone https://github.com/GUARDIANS-infrastructure/starter-kit-rems
+cd starter-kit-rems/
+# generate keys
+python3 generate_jwks.py
+# fetch secrets and other deployment config; set as env vars.
+oidc_sec_name=$(aws ssm get-parameter --name "${PARAM_OIDC_SEC_NAME}" --query Parameter.Value --output text)
+oidc_config=$(aws secretsmanager get-secret-value --secret-id $oidc_sec_name --query SecretString --output text | jq .)
+export OIDC_METADATA_URL=$(jq -r '."oidc-metadata-url"' <<< $oidc_config)
+export OIDC_CLIENT_ID=$(jq -r '."oidc-client-id"' <<< $oidc_config)
+export OIDC_CLIENT_SECRET=$(jq -r '."oidc-client-secret"' <<< $oidc_config)
+export DB_NAME=remsdb
+export DB_USER=rems
+export DB_PASSWORD=$(pwgen)
+export PUBLIC_URL=${REMS_URL}
+# configure the application: substitute $VAR / ${VAR} from the environment
+# in place (as envsubst would, unset vars become empty) in a single process
+python3 - config.edn docker-compose.yml <<'PY'
+import os, re, sys
+var = re.compile(r"\$(?:\{([A-Za-z_][A-Za-z0-9_]*)\}|([A-Za-z_][A-Za-z0-9_]*))")
+for cfgfile in sys.argv[1:]:
+    with open(cfgfile) as f:
+        cfg = f.read()
+    cfg = var.sub(lambda m: os.environ.get(m.group(1) or m.group(2), ""), cfg)
+    with open(cfgfile, "w") as f:
+        f.write(cfg)
+PY
+# start the first time
+docker-compose up -d db
+docker-compose run --rm -e CMD="migrate" app
+docker-compose up -d app
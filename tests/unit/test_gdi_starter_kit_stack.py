@@ -1,15 +1,83 @@
+import json
+import os
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
+
+from gdi_starter_kit.gdi_starter_kit_stack import (
+    EC2_AMI_PARAM,
+    GdiStarterKitStack,
+    imported_secret,
+)
 
-from gdi_starter_kit.gdi_starter_kit_stack import GdiStarterKitStack
+CONTEXT = {
+    "hz_domain": "test.example",
+    "hz_id": "Z0000000000000",
+    "rems_oidc_sec_name": "test-oidc-secret",
+}
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in gdi_starter_kit/gdi_starter_kit_stack.py
-def test_sqs_queue_created():
-    app = core.App()
+
+# synthesize once per module; every test asserts against the same template
+@pytest.fixture(scope="module")
+def template():
+    app = core.App(context=CONTEXT)
     stack = GdiStarterKitStack(app, "gdi-starter-kit")
-    template = assertions.Template.from_stack(stack)
+    return assertions.Template.from_stack(stack)
+
+
+def test_no_nat_gateway(template):
+    template.resource_count_is("AWS::EC2::NatGateway", 0)
+
+
+def test_listener_forwards_to_rems_by_default(template):
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::ListenerRule", 0)
+    (atg_id,) = template.find_resources("AWS::ElasticLoadBalancingV2::TargetGroup")
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::Listener",
+        {"DefaultActions": [{"Type": "forward", "TargetGroupArn": {"Ref": atg_id}}]},
+    )
+
+
+def test_ami_resolved_at_launch(template):
+    template.has_resource_properties(
+        "AWS::EC2::Instance", {"ImageId": f"resolve:ssm:{EC2_AMI_PARAM}"}
+    )
+
+
+def test_outputs(template):
+    (instance_id,) = template.find_resources("AWS::EC2::Instance")
+    template.has_output("RemsInstanceId", {"Value": {"Ref": instance_id}})
+    template.has_output("RemsPublicURL", {"Value": "https://rems.test.example/"})
+
+
+def test_user_data_runs_bootstrap_asset(template):
+    (instance,) = template.find_resources("AWS::EC2::Instance").values()
+    user_data = json.dumps(instance["Properties"]["UserData"])
+    assert "export REMS_URL=https://rems.test.example/" in user_data
+    assert "aws s3 cp 's3://" in user_data
+    assert "chmod +x '/tmp/" in user_data
+
+
+def test_imported_secret_is_reused():
+    stack = core.Stack(core.App())
+    first = imported_secret(stack, "some/secret")
+    assert imported_secret(stack, "some/secret").node.path == first.node.path
+    assert imported_secret(stack, "other").node.path != first.node.path
+    # names differing only by "/" vs "-" must not share a construct
+    dashed = imported_secret(stack, "some-secret")
+    assert dashed.node.path != first.node.path
+    assert dashed.secret_name == "some-secret"
+    assert imported_secret(stack, "some/secret").secret_name == "some/secret"
+
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+def test_azs_context_skips_az_lookup():
+    app = core.App(context={**CONTEXT, "azs": "ap-southeast-2a, ap-southeast-2b,"})
+    GdiStarterKitStack(
+        app,
+        "gdi-starter-kit-env",
+        env=core.Environment(account="123456789012", region="ap-southeast-2"),
+    )
+    assembly = app.synth()
+    with open(os.path.join(assembly.directory, "manifest.json")) as f:
+        assert "missing" not in json.load(f)